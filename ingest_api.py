@@ -0,0 +1,386 @@
+"""Local JSON ingestion API for roll measurements.
+
+Run next to the Streamlit app:
+
+    python ingest_api.py --port 8502
+
+Endpoints:
+    POST /measurements        one measurement object, a list of them, or {"measurements": [...]}
+    GET  /rolls/<roll_no>     measurement history for a roll (served from cache)
+    GET  /health              queue and cache status
+
+A measurement looks like:
+
+    {"roll_no": "BR-101", "date": "2026-10-19", "stand": "F1", "position": "TOP",
+     "crown": "STRAIGHT", "diameters": {"100": 1301.2, "350": 1301.5}}
+
+Entries are validated with the same rules as the Streamlit form, answered right
+away and written to Google Sheets in coalesced batches. Send an Idempotency-Key
+header (or an "idempotency_key" field per item) so retries are not stored twice.
+Set "upsert": true to overwrite an existing Roll No/Date/stand/position row.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+import tomllib
+from collections import OrderedDict
+from datetime import date as dt_date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from roll_core import (
+    DISTANCES, HEADER, open_sheet, validate_entry, entry_row, build_key_index,
+)
+
+# --- API Config ---
+DEFAULT_PORT = 8502
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+FLUSH_INTERVAL = 2.0
+MAX_BATCH = 200
+CACHE_TTL = 30
+IDEMPOTENCY_CAPACITY = 10000
+MAX_BODY_BYTES = 1_000_000
+
+log = logging.getLogger("ingest_api")
+
+
+def parse_measurement(item):
+    # Returns (entry, errors); entry carries the sheet row and its duplicate key
+    if not isinstance(item, dict):
+        return None, ["Measurement must be a JSON object"]
+
+    errors = []
+    roll_no = str(item.get("roll_no", "")).strip().upper()
+    stand = str(item.get("stand", "")).strip().upper()
+    position = str(item.get("position", "")).strip().upper()
+    crown = str(item.get("crown", "")).strip()
+    if crown.upper() == "STRAIGHT":
+        crown = "STRAIGHT"
+
+    try:
+        entry_date = dt_date.fromisoformat(str(item["date"])) if item.get("date") else dt_date.today()
+    except ValueError:
+        errors.append("Date must be YYYY-MM-DD")
+        entry_date = None
+
+    diameters = {}
+    raw_diameters = item.get("diameters", {})
+    if not isinstance(raw_diameters, dict):
+        errors.append("diameters must be an object of {distance: value}")
+        raw_diameters = {}
+    for dist, value in raw_diameters.items():
+        m = re.fullmatch(r"\s*(\d+)(?:\.0*)?\s*(?:mm)?\s*", str(dist))
+        if not m or int(m.group(1)) not in DISTANCES:
+            errors.append(f"Unknown distance {dist!r}; expected one of {DISTANCES}")
+            continue
+        try:
+            diameters[int(m.group(1))] = float(value) if str(value).strip() != "" else 0
+        except (TypeError, ValueError):
+            errors.append(f"{dist} mm value {value!r} is not a number")
+
+    filtered_diameters, rule_errors = validate_entry(roll_no, stand, position, crown, diameters)
+    errors.extend(rule_errors)
+    if errors:
+        return None, errors
+
+    return {
+        "row": entry_row(entry_date, roll_no, stand, position, crown, filtered_diameters),
+        "key": (str(entry_date), roll_no, stand, position),
+    }, []
+
+
+class SheetStore:
+    # Cached view of the sheet plus a write-behind queue flushed in batches
+
+    def __init__(self, sheet, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH, cache_ttl=CACHE_TTL):
+        self.sheet = sheet
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.cache_ttl = cache_ttl
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+
+        self.frame = pd.DataFrame()
+        self.key_index = {}
+        self.by_roll = {}
+        self.loaded_at = 0.0
+
+        self.pending_appends = OrderedDict()  # key -> row
+        self.pending_updates = OrderedDict()  # key -> row; row number resolved at flush time
+        self.in_flight = set()  # keys being appended by the current flush
+        self.idempotency = OrderedDict()
+        self.stats = {"accepted": 0, "duplicates": 0, "invalid": 0, "flushes": 0, "write_errors": 0}
+
+        self.refresh()
+        self.writer = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self.writer.start()
+
+    # --- Cache ---
+    def refresh(self):
+        frame = pd.DataFrame(self.sheet.get_all_records())
+        key_index = build_key_index(frame)
+        by_roll = {}
+        if not frame.empty and "Roll No" in frame.columns:
+            by_roll = frame.groupby(frame["Roll No"].astype(str).str.strip().str.upper()).indices
+        with self.lock:
+            self.frame, self.key_index, self.by_roll = frame, key_index, by_roll
+            self.loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if time.monotonic() - self.loaded_at > self.cache_ttl:
+            try:
+                self.refresh()
+            except Exception:
+                log.exception("Sheet refresh failed; serving stale cache")
+
+    def history(self, roll_no):
+        self._ensure_fresh()
+        roll_no = roll_no.strip().upper()
+        with self.lock:
+            positions = self.by_roll.get(roll_no, [])
+            records = self.frame.iloc[positions].to_dict("records") if len(positions) else []
+            pending = [
+                dict(zip(HEADER, row), pending=True)
+                for key, row in self.pending_appends.items() if key[1] == roll_no
+            ]
+        return records + pending
+
+    # --- Ingest ---
+    def submit(self, item, idempotency_key=None, upsert=False):
+        self._ensure_fresh()
+        with self.lock:
+            if idempotency_key is not None and idempotency_key in self.idempotency:
+                return dict(self.idempotency[idempotency_key], replayed=True)
+
+            entry, errors = parse_measurement(item)
+            if errors:
+                self.stats["invalid"] += 1
+                result = {"status": "invalid", "errors": errors}
+            else:
+                result = self._queue(entry, upsert)
+            if idempotency_key is not None and result["status"] != "invalid":
+                self.idempotency[idempotency_key] = result
+                while len(self.idempotency) > IDEMPOTENCY_CAPACITY:
+                    self.idempotency.popitem(last=False)
+
+        if len(self.pending_appends) + len(self.pending_updates) >= self.max_batch:
+            self.wake.set()
+        return result
+
+    def _queue(self, entry, upsert):
+        key, row = entry["key"], entry["row"]
+        existing_row = self.key_index.get(key)
+        is_pending = key in self.pending_appends or key in self.pending_updates or key in self.in_flight
+
+        if (existing_row is not None or is_pending) and not upsert:
+            self.stats["duplicates"] += 1
+            return {"status": "exists", "key": list(key), "row": existing_row}
+
+        if existing_row is not None or key in self.pending_updates:
+            self.pending_updates[key] = row
+        else:
+            # Upserts of in-flight keys become row updates once the flush lands
+            self.pending_appends[key] = row
+        self.stats["accepted"] += 1
+        return {"status": "updated" if existing_row is not None or is_pending else "accepted", "key": list(key)}
+
+    # --- Writer ---
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                appends = list(self.pending_appends.items())
+                updates = list(self.pending_updates.items())
+                self.pending_appends.clear()
+                self.pending_updates.clear()
+                self.in_flight = {key for key, _ in appends}
+            if not appends and not updates:
+                return
+
+            try:
+                to_append, written, response = list(appends), [], None
+                if updates:
+                    # Rows can move (app deletes, Remove Duplicates) while upserts wait
+                    # in the queue, so row numbers come from a read made just now
+                    self.refresh()
+                    with self.lock:
+                        targets = [(self.key_index.get(key), key, row) for key, row in updates]
+                        # A row deleted in the meantime is appended again instead
+                        gone = [(key, row) for row_num, key, row in targets if row_num is None]
+                        self.in_flight.update(key for key, _ in gone)
+                    to_append += gone
+                    written = [(row_num, row) for row_num, _, row in targets if row_num is not None]
+                    if written:
+                        self.sheet.batch_update([{"range": f"A{row_num}", "values": [row]} for row_num, row in written])
+                if to_append:
+                    response = self.sheet.append_rows([row for _, row in to_append])
+            except Exception:
+                log.exception("Batch write failed; re-queueing %d rows", len(appends) + len(updates))
+                with self.lock:
+                    self.stats["write_errors"] += 1
+                    for key, row in appends:
+                        self.pending_appends.setdefault(key, row)
+                    for key, row in updates:
+                        self.pending_updates.setdefault(key, row)
+                    self.in_flight = set()
+                return
+
+            # Pick up the new row numbers so later upserts hit the right rows
+            try:
+                self._record_writes(written, to_append, response)
+            except Exception:
+                log.exception("Sheet refresh after flush failed")
+            with self.lock:
+                self.stats["flushes"] += 1
+                self.in_flight = set()
+                for key in [k for k in self.pending_appends if k in self.key_index]:
+                    self.pending_updates[key] = self.pending_appends.pop(key)
+
+    def _record_writes(self, written, appended, response):
+        # Apply the flushed rows to the cache. Appended rows are placed from the range
+        # Sheets reports back, so a flush costs no extra read unless the cache has
+        # fallen out of step with the sheet (rows added by someone else).
+        updated_range = ((response or {}).get("updates") or {}).get("updatedRange", "")
+        m = re.search(r"![A-Z]+(\d+)", updated_range)
+        with self.lock:
+            in_step = not appended or (m is not None and int(m.group(1)) == len(self.frame) + 2)
+            if in_step:
+                frame = self.frame.astype(object) if written else self.frame
+                for row_num, row in written:
+                    frame.iloc[row_num - 2, :len(row)] = row
+                if appended:
+                    start = len(frame)
+                    new = pd.DataFrame([row for _, row in appended], columns=HEADER)
+                    frame = pd.concat([frame, new], ignore_index=True) if not frame.empty else new
+                    for i, (key, _) in enumerate(appended):
+                        self.key_index[key] = start + i + 2
+                        self.by_roll[key[1]] = np.append(self.by_roll.get(key[1], []), start + i).astype(int)
+                self.frame = frame
+        if not in_step:
+            self.refresh()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def close(self):
+        self.stopped.set()
+        self.wake.set()
+        self.writer.join()
+        self.flush()
+
+    def status(self):
+        with self.lock:
+            return {
+                "rows_cached": len(self.frame),
+                "cache_age_s": round(time.monotonic() - self.loaded_at, 1),
+                "pending_appends": len(self.pending_appends),
+                "pending_updates": len(self.pending_updates),
+                **self.stats,
+            }
+
+
+def make_handler(store):
+    class IngestHandler(BaseHTTPRequestHandler):
+        server_version = "RollIngest/1.0"
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/health":
+                self._send(200, store.status())
+            elif path.startswith("/rolls/"):
+                roll_no = unquote(path[len("/rolls/"):])
+                self._send(200, {"roll_no": roll_no.strip().upper(), "measurements": store.history(roll_no)})
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path.split("?", 1)[0].rstrip("/") != "/measurements":
+                self._send(404, {"error": "Not found"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                self._send(400, {"error": "Invalid Content-Length"})
+                return
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self._send(413 if length > MAX_BODY_BYTES else 400, {"error": "Missing or oversized body"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(length))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                self._send(400, {"error": "Body is not valid JSON"})
+                return
+
+            batched = isinstance(payload, list) or (isinstance(payload, dict) and "measurements" in payload)
+            items = payload if isinstance(payload, list) else payload.get("measurements", [payload]) if isinstance(payload, dict) else [payload]
+            if not isinstance(items, list):
+                self._send(400, {"error": "measurements must be a list"})
+                return
+
+            header_key = self.headers.get("Idempotency-Key")
+            results = []
+            for i, item in enumerate(items):
+                item_key = item.get("idempotency_key") if isinstance(item, dict) else None
+                if item_key is None and header_key:
+                    item_key = f"{header_key}:{i}" if batched else header_key
+                upsert = bool(item.get("upsert")) if isinstance(item, dict) else False
+                results.append(store.submit(item, idempotency_key=item_key, upsert=upsert))
+
+            ok = any(r["status"] in ("accepted", "updated") for r in results)
+            status = 202 if ok else 409 if any(r["status"] == "exists" for r in results) else 422
+            self._send(status, {"results": results} if batched else results[0])
+
+        def log_message(self, fmt, *args):
+            log.info("%s - %s", self.address_string(), fmt % args)
+
+    return IngestHandler
+
+
+def load_credentials(path):
+    with open(path, "rb") as f:
+        return tomllib.load(f)["gcp_service_account"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll measurement ingestion API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--secrets", default=SECRETS_PATH, help="Streamlit secrets.toml with gcp_service_account")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    store = SheetStore(open_sheet(load_credentials(args.secrets)), flush_interval=args.flush_interval)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+    log.info("Listening on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""Concurrent-session load test for streamlit_app.py.
+
+Drives simulated operator sessions through the app with Streamlit's headless
+AppTest API against a local fake worksheet that enforces per-minute Sheets
+quotas, then reports rerun latency, API calls per action and throttling.
+The app opens the sheet on every rerun, so those opens are charged too.
+
+    python load_test.py --sessions 20 --workers 4 --actions 15
+
+AppTest swaps process-wide Streamlit state while a script runs, so sessions
+cannot share a thread pool. Each worker process hosts several sessions and
+interleaves their actions round-robin; sessions in one worker share a
+Streamlit cache like sessions on one server do. Use --workers 1 to model a
+single server process. All workers talk to one fake worksheet, so quotas and
+row edits are shared across every session.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date as dt_date, timedelta
+from multiprocessing import Process, Queue
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+
+import pandas as pd
+
+import roll_core
+from roll_core import DISTANCES, HEADER, STANDS, POSITIONS, CROWNS
+
+APP_PATH = str(Path(__file__).with_name("streamlit_app.py"))
+
+# --- Load Test Config ---
+READ_QUOTA = 60  # Sheets read requests per minute per user
+WRITE_QUOTA = 60  # Sheets write requests per minute per user
+QUOTA_WINDOW = 60.0
+ACTION_WEIGHTS = {"add": 3, "page": 2, "edit": 1, "delete": 1, "plot": 2, "download": 1}
+READ_METHODS = {"get_all_records", "open_sheet"}
+# Sheets requests per call. open_sheet is client.open() plus .sheet1, which each
+# fetch the spreadsheet metadata; its Drive title lookup is counted separately.
+REQUEST_COST = {"open_sheet": 2}
+MIN_SEED_DIA, MAX_SEED_DIA = 1260.0, 1340.0
+
+
+# --- Fake Sheets Backend ---
+class FakeWorksheet:
+    # In-memory worksheet served from a manager process so every worker shares it
+
+    def __init__(self, seed_rows=0, read_quota=READ_QUOTA, write_quota=WRITE_QUOTA,
+                 window=QUOTA_WINDOW, wait_on_quota=False, seed=0):
+        self.lock = threading.Lock()
+        self.rows = [seed_row(i, random.Random(seed + i)) for i in range(seed_rows)]
+        self.quota = {"read": read_quota, "write": write_quota}
+        self.window = window
+        self.wait_on_quota = wait_on_quota
+        self.calls = {"read": deque(), "write": deque()}
+        self.stats = {"read": 0, "write": 0, "drive": 0, "throttled": 0, "waited_s": 0.0}
+
+    def _admit(self, kind, cost=1):
+        # Sliding-window quota: either reject (like a 429) or wait for a free slot
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                calls = self.calls[kind]
+                while calls and now - calls[0] >= self.window:
+                    calls.popleft()
+                if len(calls) + cost <= self.quota[kind]:
+                    calls.extend([now] * cost)
+                    self.stats[kind] += cost
+                    return True, 0.0
+                self.stats["throttled"] += 1
+                retry_after = self.window - (now - calls[0])
+            if not self.wait_on_quota:
+                return False, retry_after
+            time.sleep(min(retry_after, 1.0))
+            with self.lock:
+                self.stats["waited_s"] += min(retry_after, 1.0)
+
+    def call(self, method, args, kwargs):
+        kind = "read" if method in READ_METHODS else "write"
+        cost = REQUEST_COST.get(method, 1)
+        admitted, retry_after = self._admit(kind, cost)
+        if not admitted:
+            return {"throttled": True, "kind": kind, "retry_after": retry_after}
+        with self.lock:
+            return {"throttled": False, "kind": kind, "cost": cost,
+                    "value": getattr(self, "_" + method)(*args, **kwargs)}
+
+    def snapshot(self):
+        with self.lock:
+            return {"rows": len(self.rows), **self.stats}
+
+    # --- gspread surface used by the app and the ingestion API ---
+    def _open_sheet(self):
+        self.stats["drive"] += 1
+
+    def _get_all_records(self):
+        return [dict(zip(HEADER, row)) for row in self.rows]
+
+    def _append_row(self, row):
+        return self._append_rows([row])
+
+    def _append_rows(self, rows):
+        # Same shape as the Sheets values.append response gspread returns
+        start = len(self.rows) + 2
+        self.rows.extend(list(r) for r in rows)
+        return {"updates": {"updatedRange": f"Sheet1!A{start}:{chr(64 + len(HEADER))}{len(self.rows) + 1}",
+                            "updatedRows": len(rows)}}
+
+    def _update(self, range_name=None, values=None):
+        row_num = int("".join(ch for ch in range_name if ch.isdigit()))
+        self.rows[row_num - 2] = list(values[0])
+
+    def _update_cell(self, row, col, value):
+        self.rows[row - 2][col - 1] = value
+
+    def _delete_rows(self, start_index, end_index=None):
+        del self.rows[start_index - 2:(end_index or start_index) - 1]
+
+    def _batch_update(self, data):
+        for item in data:
+            self._update(item["range"], item["values"])
+
+    def _spreadsheet_batch_update(self, body):
+        deletes = [r["deleteDimension"]["range"] for r in body.get("requests", []) if "deleteDimension" in r]
+        for rng in sorted(deletes, key=lambda r: r["startIndex"], reverse=True):
+            del self.rows[rng["startIndex"] - 1:rng["endIndex"] - 1]
+
+
+class BackendManager(BaseManager):
+    pass
+
+
+BackendManager.register("FakeWorksheet", FakeWorksheet)
+
+
+def seed_row(i, rng):
+    when = dt_date(2024, 1, 1) + timedelta(days=i // 4)
+    base = rng.uniform(MIN_SEED_DIA, MAX_SEED_DIA)
+    return [str(when), f"BR{i % 50:03d}", rng.choice(STANDS), rng.choice(POSITIONS), rng.choice(CROWNS)] + [
+        round(base + rng.uniform(-0.5, 0.5), 2) for _ in DISTANCES
+    ]
+
+
+def _throttle_error(kind, retry_after):
+    # Shape a gspread APIError like the one Sheets returns for quota exhaustion
+    class _Response:
+        text = "Quota exceeded"
+
+        def json(self):
+            return {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                              "message": f"Quota exceeded for {kind} requests; retry in {retry_after:.0f}s"}}
+
+    import gspread
+    return gspread.exceptions.APIError(_Response())
+
+
+class SessionSheet:
+    # gspread.Worksheet stand-in for one session; forwards to the shared backend and counts calls
+
+    id = 0
+
+    def __init__(self, backend, counters):
+        self.backend = backend
+        self.counters = counters
+        self.spreadsheet = self
+
+    def _call(self, method, *args, **kwargs):
+        result = self.backend.call(method, args, kwargs)
+        if result["throttled"]:
+            self.counters["throttled"] += 1
+            raise _throttle_error(result["kind"], result["retry_after"])
+        self.counters[result["kind"]] += result["cost"]
+        return result["value"]
+
+    @classmethod
+    def open(cls, backend, counters):
+        # Stands in for roll_core.open_sheet. gspread.authorize() makes no request,
+        # but client.open().sheet1 does a Drive lookup and two metadata fetches
+        sheet = cls(backend, counters)
+        sheet._call("open_sheet")
+        return sheet
+
+    def get_all_records(self):
+        return self._call("get_all_records")
+
+    def append_row(self, row):
+        return self._call("append_row", list(row))
+
+    def append_rows(self, rows):
+        return self._call("append_rows", [list(r) for r in rows])
+
+    def update(self, range_name=None, values=None):
+        return self._call("update", range_name=range_name, values=values)
+
+    def update_cell(self, row, col, value):
+        return self._call("update_cell", row, col, value)
+
+    def delete_rows(self, start_index, end_index=None):
+        return self._call("delete_rows", start_index, end_index)
+
+    def batch_update(self, body):
+        # Worksheet.batch_update takes a list, Spreadsheet.batch_update a request body
+        if isinstance(body, dict):
+            return self._call("spreadsheet_batch_update", body)
+        return self._call("batch_update", body)
+
+
+# --- Session Actions ---
+# Each action is a generator: it sets widgets and yields once per rerun it needs.
+def _widget(elements, label):
+    for el in elements:
+        if el.label == label:
+            return el
+    return None
+
+
+def _require(elements, label):
+    widget = _widget(elements, label)
+    if widget is None:
+        raise LookupError(f"{label!r} not on page (selection reset by a concurrent change?)")
+    return widget
+
+
+def _click(at, label):
+    _require(at.button, label).click()
+
+
+def act_add(at, rng):
+    _require(at.text_input, "🏷️ Roll No (required)").input(f"LT{rng.randrange(10000):04d}")
+    _require(at.selectbox, " Stand").select(rng.choice(STANDS))
+    _require(at.selectbox, "📍 Position").select(rng.choice(POSITIONS))
+    _require(at.selectbox, " Crown").select(rng.choice(CROWNS))
+    base = rng.uniform(MIN_SEED_DIA, MAX_SEED_DIA)
+    for d in DISTANCES:
+        at.text_input(key=f"dia_{d}").input(f"{base + rng.uniform(-0.5, 0.5):.2f}")
+    _click(at, "💾 Save Entry")
+    yield
+
+
+def act_page(at, rng):
+    page = _widget(at.number_input, "📄 Page")
+    if page is not None:
+        page.set_value(rng.randint(1, int(page.max or 1)))
+        yield
+
+
+def _select_row(at, rng):
+    rows = _widget(at.selectbox, "Select a row to edit or delete:")
+    if rows is None or len(rows.options) < 2:
+        return False
+    rows.select(rng.choice(rows.options[1:]))
+    return True
+
+
+def act_edit(at, rng):
+    if _select_row(at, rng):
+        yield
+        _click(at, "✏️ Edit This Row")
+        yield
+        update = _widget(at.button, "💾 Update Entry")
+        if update is not None:
+            update.click()
+            yield
+
+
+def act_delete(at, rng):
+    if _select_row(at, rng):
+        yield
+        _click(at, "🗑️ Delete This Row")
+        yield
+        confirm = _widget(at.button, "🗑️ Delete This Row")
+        if confirm is not None:
+            confirm.click()
+            yield
+
+
+def act_plot(at, rng):
+    rolls = _widget(at.selectbox, "Select Roll No")
+    if rolls is not None and len(rolls.options) > 1:
+        rolls.select(rng.choice(rolls.options[1:]))
+        yield
+        dates = next((m for m in at.multiselect if m.label.startswith("Select one or more Dates")), None)
+        if dates is not None and len(dates.options) > 1:
+            dates.select(rng.choice(dates.options))
+            yield
+
+
+def act_download(at, rng):
+    prepare = _widget(at.button, "📦 Prepare Export")
+    if prepare is not None:
+        prepare.click()
+        yield
+
+
+ACTIONS = {"add": act_add, "page": act_page, "edit": act_edit, "delete": act_delete,
+           "plot": act_plot, "download": act_download}
+
+
+def _timed_run(at, counters, timeout):
+    before = dict(counters)
+    start = time.perf_counter()
+    at.run(timeout=timeout)
+    elapsed = time.perf_counter() - start
+    return {
+        "latency": elapsed,
+        "read": counters["read"] - before["read"],
+        "write": counters["write"] - before["write"],
+        "throttled": counters["throttled"] - before["throttled"],
+        "error": bool(at.exception),
+        "detail": at.exception[0].message if at.exception else None,
+    }
+
+
+def _run_action(at, counters, action, rng, timeout):
+    # One record per action; latency is kept per rerun for the percentiles
+    totals = {"read": 0, "write": 0, "throttled": 0, "error": False, "detail": None}
+    latencies = []
+    try:
+        for _ in ACTIONS[action](at, rng):
+            rec = _timed_run(at, counters, timeout)
+            latencies.append(rec["latency"])
+            for k in ("read", "write", "throttled"):
+                totals[k] += rec[k]
+            if rec["error"] and not totals["error"]:
+                totals["error"], totals["detail"] = True, rec["detail"]
+    except Exception as e:  # a widget missing after an error page, or a timed-out rerun
+        totals["error"], totals["detail"] = True, totals["detail"] or repr(e)
+    return dict(totals, latencies=latencies)
+
+
+def run_worker(worker_id, session_ids, backend, args, results):
+    from streamlit.testing.v1 import AppTest
+
+    counters = {}
+    roll_core.open_sheet = lambda info: SessionSheet.open(backend, counters[info["session"]])
+
+    sessions = []
+    for sid in session_ids:
+        counters[sid] = {"read": 0, "write": 0, "throttled": 0}
+        at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+        at.secrets["gcp_service_account"] = {"session": sid}
+        sessions.append((sid, at, random.Random(args.seed * 1000 + sid)))
+
+    names, weights = zip(*ACTION_WEIGHTS.items())
+    records = []
+    for sid, at, _ in sessions:
+        rec = _timed_run(at, counters[sid], args.timeout)
+        records.append(dict(rec, latencies=[rec.pop("latency")], action="open", session=sid))
+
+    for _ in range(args.actions):
+        for sid, at, rng in sessions:
+            action = rng.choices(names, weights)[0]
+            records.append(dict(_run_action(at, counters[sid], action, rng, args.timeout), action=action, session=sid))
+            if args.think_time:
+                time.sleep(rng.uniform(0, args.think_time))
+
+    results.put((worker_id, records))
+
+
+# --- Report ---
+def summarize(records, elapsed, backend_stats, args):
+    frame = pd.DataFrame(records)
+    reruns = frame[["action", "latencies"]].explode("latencies").dropna()
+    reruns["latency"] = reruns["latencies"].astype(float) * 1000
+    grouped = frame.groupby("action")
+    # Actions that found nothing to do (no rows to edit, no export button) made no
+    # reruns; they are counted as skipped and left out of the per-action means
+    no_reruns = frame["latencies"].str.len() == 0
+    ran = frame[~no_reruns].groupby("action")
+    latency = reruns.groupby("action")["latency"]
+    table = pd.DataFrame({
+        "actions": grouped.size(),
+        "skipped": (no_reruns & ~frame["error"]).groupby(frame["action"]).sum(),
+        "reruns": latency.size(),
+        "p50 ms": latency.quantile(0.50),
+        "p95 ms": latency.quantile(0.95),
+        "reads/action": ran["read"].mean(),
+        "writes/action": ran["write"].mean(),
+        "throttled": grouped["throttled"].sum(),
+        "errors": grouped["error"].sum(),
+    }).round(2)
+    overall = {
+        "sessions": args.sessions,
+        "workers": args.workers,
+        "actions": int(len(frame)),
+        "reruns": int(len(reruns)),
+        "elapsed_s": round(elapsed, 1),
+        "p50_ms": round(float(reruns["latency"].quantile(0.50)), 1),
+        "p95_ms": round(float(reruns["latency"].quantile(0.95)), 1),
+        "reads_per_min": round(backend_stats["read"] / elapsed * 60, 1),
+        "writes_per_min": round(backend_stats["write"] / elapsed * 60, 1),
+        "drive_lookups_per_min": round(backend_stats["drive"] / elapsed * 60, 1),
+        "throttle_events": int(backend_stats["throttled"]),
+        "errors": int(frame["error"].sum()),
+        "rows_after": backend_stats["rows"],
+    }
+    errors = frame.loc[frame["error"], "detail"].fillna("unknown").str.slice(0, 120).value_counts()
+    return table, overall, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the roll profile app")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2, help="worker processes; sessions are split across them")
+    parser.add_argument("--actions", type=int, default=10, help="actions per session after the first page load")
+    parser.add_argument("--seed-rows", type=int, default=200)
+    parser.add_argument("--read-quota", type=int, default=READ_QUOTA, help="read requests per window")
+    parser.add_argument("--write-quota", type=int, default=WRITE_QUOTA, help="write requests per window")
+    parser.add_argument("--quota-window", type=float, default=QUOTA_WINDOW, help="quota window in seconds")
+    parser.add_argument("--wait-on-quota", action="store_true", help="block instead of failing when over quota")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between actions (s)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-rerun timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--fail-p95-ms", type=float, help="exit non-zero if overall p95 exceeds this")
+    args = parser.parse_args()
+    args.workers = max(1, min(args.workers, args.sessions))
+
+    with BackendManager() as manager:
+        backend = manager.FakeWorksheet(args.seed_rows, args.read_quota, args.write_quota,
+                                        args.quota_window, args.wait_on_quota, args.seed)
+        results = Queue()
+        workers = [
+            Process(target=run_worker, args=(w, list(range(w, args.sessions, args.workers)), backend, args, results))
+            for w in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for p in workers:
+            p.start()
+        records = []
+        for _ in workers:
+            records.extend(results.get()[1])
+        for p in workers:
+            p.join()
+        elapsed = time.perf_counter() - start
+        backend_stats = backend.snapshot()
+
+    table, overall, errors = summarize(records, elapsed, backend_stats, args)
+    print(table.to_string())
+    print()
+    for key, value in overall.items():
+        print(f"{key:>21}: {value}")
+    if not errors.empty:
+        print("\nErrors:")
+        for detail, count in errors.items():
+            print(f"  {count:>4} x {detail}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"overall": overall, "actions": table.reset_index().to_dict("records"),
+                       "errors": errors.to_dict()}, f, indent=2)
+
+    if args.fail_p95_ms is not None and overall["p95_ms"] > args.fail_p95_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
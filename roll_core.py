@@ -0,0 +1,90 @@
+import re
+
+import pandas as pd
+import gspread
+from google.oauth2.service_account import Credentials
+
+# Shared by the Streamlit app and the ingestion API so both enforce the same rules
+
+# --- Google Sheets Config ---
+SHEET_NAME = "Roll_Data"
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# --- Roll Config ---
+DISTANCES = [100, 350, 600, 850, 1100, 1350, 1600]
+MIN_DIA = 1245.0
+MAX_DIA = 1352.0
+STANDS = ['F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'ROUGHING', 'DC']
+POSITIONS = ['TOP', 'BOTTOM']
+CROWNS = ['STRAIGHT', '+100µ', '+200µ']
+HEADER = ["Date", "Roll No", "stand", "position", "crown"] + [str(d) for d in DISTANCES]
+
+# --- Duplicate Index ---
+KEY_COLUMNS = ["Date", "Roll No", "stand", "position"]
+
+
+def open_sheet(creds_info):
+    creds = Credentials.from_service_account_info(creds_info, scopes=SCOPE)
+    client = gspread.authorize(creds)
+    return client.open(SHEET_NAME).sheet1
+
+
+def validate_entry(roll_no, stand, position, crown, diameters):
+    # Returns (diameters to store, error messages). Blank/0 diameters are skipped.
+    errors = []
+
+    if roll_no == "":
+        errors.append("Roll No cannot be empty")
+
+    if stand not in STANDS:
+        errors.append("Please select a Stand")
+
+    if position not in POSITIONS:
+        errors.append("Please select a Position")
+
+    if crown not in CROWNS:
+        errors.append("Please select a Crown type")
+
+    filtered_diameters = {}
+    for d, v in diameters.items():
+        if v == 0:
+            continue
+        if not (MIN_DIA <= v <= MAX_DIA):
+            errors.append(f"{d} mm value {v} out of range [{MIN_DIA}-{MAX_DIA}]")
+        else:
+            filtered_diameters[d] = v
+
+    return filtered_diameters, errors
+
+
+def distance_columns(columns):
+    # (distance, column) for each configured distance found in the sheet headers,
+    # in DISTANCES order; the first column naming a distance wins
+    found = {}
+    for col in columns:
+        m = re.search(r"(\d+)", str(col))
+        if m and int(m.group(1)) in DISTANCES:
+            found.setdefault(int(m.group(1)), col)
+    return [(d, found[d]) for d in DISTANCES if d in found]
+
+
+def entry_row(entry_date, roll_no, stand, position, crown, diameters):
+    return [str(entry_date), roll_no, stand, position, crown] + [diameters.get(d, "") for d in DISTANCES]
+
+
+def record_keys(frame):
+    # (Date, Roll No, stand, position) normalised the same way the form writes them
+    dates = frame["Date"].astype(str).str.strip()
+    parsed = pd.to_datetime(dates, errors="coerce").dt.strftime("%Y-%m-%d")
+    parts = [parsed.fillna(dates)] + [frame[c].astype(str).str.strip().str.upper() for c in KEY_COLUMNS[1:]]
+    return pd.Series(list(zip(*parts)), index=frame.index, dtype=object)
+
+
+def build_key_index(frame):
+    # key -> sheet row number (header is row 1); later rows win on duplicates
+    if frame.empty or any(c not in frame.columns for c in KEY_COLUMNS):
+        return {}
+    return dict(zip(record_keys(frame), frame.index + 2))
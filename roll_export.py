@@ -0,0 +1,110 @@
+import io
+import tempfile
+
+import pandas as pd
+import xlsxwriter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# --- Export Config ---
+EXPORT_CHUNK_ROWS = 5000
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # larger exports roll over to a temp file
+
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.csv)": ("csv", "text/csv"),
+}
+if pq is not None:
+    EXPORT_FORMATS["Parquet (.parquet)"] = ("parquet", "application/vnd.apache.parquet")
+
+
+def filter_frame(frame, columns=None, date_from=None, date_to=None, stands=None, date_col="Date", stand_col="stand"):
+    # Build the row mask first and only materialise the requested columns
+    mask = pd.Series(True, index=frame.index)
+    if (date_from is not None or date_to is not None) and date_col in frame.columns:
+        dates = pd.to_datetime(frame[date_col], errors="coerce")
+        if date_from is not None:
+            mask &= dates >= pd.Timestamp(date_from)
+        if date_to is not None:
+            mask &= dates <= pd.Timestamp(date_to)
+    if stands and stand_col in frame.columns:
+        mask &= frame[stand_col].astype(str).str.strip().str.upper().isin([s.upper() for s in stands])
+    columns = [c for c in (columns or frame.columns) if c in frame.columns]
+    return frame.loc[mask, columns]
+
+
+def numeric_columns(frame):
+    # Columns where every non-blank value parses as a number (diameters)
+    numeric = []
+    for col in frame.columns:
+        values = frame[col]
+        if pd.api.types.is_numeric_dtype(values):
+            numeric.append(col)
+            continue
+        text = values.astype(str).str.strip()
+        filled = values.notna() & (text != "")
+        parsed = pd.to_numeric(text.str.replace(",", "", regex=False).where(filled), errors="coerce")
+        if filled.any() and parsed[filled].notna().all():
+            numeric.append(col)
+    return numeric
+
+
+def iter_chunks(frame, numeric, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Typed chunks: numbers as float (NaN for blanks), everything else as text
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows].copy()
+        for col in chunk.columns:
+            if col in numeric:
+                chunk[col] = pd.to_numeric(chunk[col].astype(str).str.replace(",", "", regex=False), errors="coerce")
+            else:
+                chunk[col] = chunk[col].fillna("").astype(str)
+        yield chunk
+
+
+def _write_xlsx(frame, numeric, out, chunk_rows):
+    workbook = xlsxwriter.Workbook(out, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("RollData")
+    header_format = workbook.add_format({'bold': True})
+    worksheet.write_row(0, 0, [str(c) for c in frame.columns], header_format)
+    row = 1
+    for chunk in iter_chunks(frame, numeric, chunk_rows):
+        for values in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, values)
+            row += 1
+    workbook.close()
+
+
+def _write_csv(frame, numeric, out, chunk_rows):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    if frame.empty:
+        pd.DataFrame(columns=frame.columns).to_csv(text, index=False)
+    for i, chunk in enumerate(iter_chunks(frame, numeric, chunk_rows)):
+        chunk.to_csv(text, header=(i == 0), index=False)
+    text.detach()
+
+
+def _write_parquet(frame, numeric, out, chunk_rows):
+    schema = pa.schema([
+        (str(col), pa.float64() if col in numeric else pa.string()) for col in frame.columns
+    ])
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in iter_chunks(frame, numeric, chunk_rows):
+            chunk.columns = [str(c) for c in chunk.columns]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+_WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv, "parquet": _write_parquet}
+
+
+def export_table(frame, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Returns a file object positioned at 0; it stays in memory until it
+    # outgrows SPOOL_MAX_BYTES, then spills to disk.
+    ext = EXPORT_FORMATS[fmt][0] if fmt in EXPORT_FORMATS else fmt
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    _WRITERS[ext](frame, numeric_columns(frame), out, chunk_rows)
+    out.seek(0)
+    return out
@@ -0,0 +1,133 @@
+import threading
+from datetime import date as dt_date
+
+import numpy as np
+import pandas as pd
+
+from roll_core import MIN_DIA
+from roll_profiles import profile_matrix
+
+# --- Forecast Config ---
+FORECAST_HORIZON_DAYS = 3650
+
+
+def _batched_trend(group, x, y, n_groups):
+    # Least-squares line per group, all groups solved at once from bincount sums
+    n = np.bincount(group, minlength=n_groups)
+    sx = np.bincount(group, x, n_groups)
+    sy = np.bincount(group, y, n_groups)
+    sxx = np.bincount(group, x * x, n_groups)
+    sxy = np.bincount(group, x * y, n_groups)
+    den = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(den > 0, (n * sxy - sx * sy) / den, np.nan)
+        intercept = (sy - slope * sx) / n
+    return slope, intercept
+
+
+def _scrap_crossing(slope, intercept):
+    # Point where each worn (negative) trend reaches MIN_DIA, earliest distance wins
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = np.where(slope < 0, (MIN_DIA - intercept) / slope, np.nan)
+    return np.where(np.isnan(crossing), np.inf, crossing).min(axis=1, initial=np.inf)
+
+
+def _forecast_batch(frame, date_col, roll_col, dist_cols):
+    frame = frame.assign(_when=pd.to_datetime(frame[date_col], errors="coerce"))
+    row_counts = frame[roll_col].astype(str).value_counts()
+    # Rows without a usable date can't be placed in the wear history
+    frame = frame[frame["_when"].notna()].sort_values("_when", kind="stable").reset_index(drop=True)
+    codes, rolls = pd.factorize(frame[roll_col].astype(str))
+    n_rolls, n_dist = len(rolls), len(dist_cols)
+    values = profile_matrix(frame, dist_cols)
+
+    ref = frame["_when"].min()
+    days = (frame["_when"] - ref).dt.days.to_numpy(dtype=float)
+    campaign = frame.groupby(codes).cumcount().to_numpy(dtype=float)
+
+    rows, cols = np.nonzero(~np.isnan(values))
+    group = codes[rows] * n_dist + cols
+    y = values[rows, cols]
+
+    t_slope, t_icpt = _batched_trend(group, days[rows], y, n_rolls * n_dist)
+    c_slope, c_icpt = _batched_trend(group, campaign[rows], y, n_rolls * n_dist)
+    t_slope, t_icpt = t_slope.reshape(n_rolls, n_dist), t_icpt.reshape(n_rolls, n_dist)
+    c_slope, c_icpt = c_slope.reshape(n_rolls, n_dist), c_icpt.reshape(n_rolls, n_dist)
+
+    first = frame.groupby(codes).head(1).index.to_numpy()
+    last = frame.groupby(codes).tail(1).index.to_numpy()
+    first_day, last_day = np.zeros(n_rolls), np.zeros(n_rolls)
+    first_day[codes[first]], last_day[codes[last]] = days[first], days[last]
+    last_campaign = np.bincount(codes, minlength=n_rolls) - 1
+
+    # The horizon runs from each roll's own last measurement, so a roll's forecast
+    # does not depend on which other rolls were refitted with it
+    scrap_day = _scrap_crossing(t_slope, t_icpt)
+    scrap_day[scrap_day - last_day > FORECAST_HORIZON_DAYS] = np.inf
+    # Same horizon in campaigns, at the roll's average campaign length
+    scrap_campaign = _scrap_crossing(c_slope, c_icpt)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_per_campaign = (last_day - first_day) / last_campaign
+    beyond = (days_per_campaign > 0) & ((scrap_campaign - last_campaign) * days_per_campaign > FORECAST_HORIZON_DAYS)
+    scrap_campaign[beyond] = np.inf
+
+    last_values = values[last]
+    latest_min = np.full(n_rolls, np.nan)
+    latest_min[codes[last]] = np.where(np.isnan(last_values), np.inf, last_values).min(axis=1, initial=np.inf)
+    wear_rate = np.where(np.isnan(t_slope), np.inf, t_slope).min(axis=1, initial=np.inf)
+    last_when = pd.Series(frame["_when"].to_numpy()[last], index=codes[last]).reindex(range(n_rolls))
+
+    records = {}
+    for i, roll in enumerate(rolls):
+        scrap_date = ref + pd.Timedelta(days=float(scrap_day[i])) if np.isfinite(scrap_day[i]) else pd.NaT
+        records[roll] = {
+            "Roll No": roll,
+            "Measurements": int(row_counts[roll]),
+            "Last Date": last_when.iloc[i],
+            "Latest Min Dia (mm)": latest_min[i] if np.isfinite(latest_min[i]) else np.nan,
+            "Wear Rate (mm/day)": -wear_rate[i] if np.isfinite(wear_rate[i]) and wear_rate[i] < 0 else np.nan,
+            "Scrap Date": scrap_date,
+            "Campaigns Left": scrap_campaign[i] - last_campaign[i] if np.isfinite(scrap_campaign[i]) else np.nan,
+        }
+    for roll in row_counts.index.difference(rolls):
+        records[roll] = {
+            "Roll No": roll, "Measurements": int(row_counts[roll]), "Last Date": pd.NaT,
+            "Latest Min Dia (mm)": np.nan, "Wear Rate (mm/day)": np.nan,
+            "Scrap Date": pd.NaT, "Campaigns Left": np.nan,
+        }
+    return records
+
+
+class ForecastCache:
+    # Per-roll forecast records shared by every session. Each roll is stored with
+    # a hash of its rows so only rolls whose rows changed are refitted.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = {}  # roll -> (signature, forecast record)
+
+    def forecast(self, frame, date_col, roll_col, dist_cols):
+        frame = frame.reset_index(drop=True)
+        rolls = frame[roll_col].astype(str)
+        row_hash = pd.util.hash_pandas_object(frame[[date_col, roll_col] + dist_cols].astype(str), index=False)
+        signatures = row_hash.groupby(rolls.values).sum()
+
+        with self.lock:
+            for dropped in set(self.records) - set(signatures.index):
+                del self.records[dropped]
+            current = {r: self.records[r][1] for r, sig in signatures.items()
+                       if r in self.records and self.records[r][0] == sig}
+
+        # Fit outside the lock; sessions racing on the same rolls just refit them twice
+        stale = [r for r in signatures.index if r not in current]
+        if stale:
+            fresh = _forecast_batch(frame[rolls.isin(stale)].reset_index(drop=True), date_col, roll_col, dist_cols)
+            with self.lock:
+                for roll, record in fresh.items():
+                    self.records[roll] = (signatures[roll], record)
+            current.update(fresh)
+
+        result = pd.DataFrame([current[r] for r in signatures.index if r in current])
+        if not result.empty:
+            result.insert(6, "Days Left", (result["Scrap Date"] - pd.Timestamp(dt_date.today())).dt.days)
+        return result
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+# --- Profile Engine Config ---
+RESAMPLE_STEP = 25
+RESAMPLE_METHODS = ["spline", "linear"]
+
+
+def profile_matrix(rows, distance_cols):
+    # One row per measurement, one column per distance, NaN where blank
+    cleaned = rows[distance_cols].astype(str).apply(lambda c: c.str.strip().str.replace(",", "", regex=False))
+    return cleaned.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float).reshape(len(rows), len(distance_cols))
+
+
+def _pchip_slopes(x, y):
+    # Fritsch-Carlson slopes (same "monotone" shape the Altair chart draws)
+    h = np.diff(x)
+    delta = np.diff(y, axis=1) / h
+    n = x.size
+    slopes = np.zeros_like(y)
+    if n == 2:
+        slopes[:, 0] = slopes[:, 1] = delta[:, 0]
+        return slopes
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same_sign = (delta[:, :-1] * delta[:, 1:]) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        harmonic = (w1 + w2) / (w1 / delta[:, :-1] + w2 / delta[:, 1:])
+    slopes[:, 1:-1] = np.where(same_sign, harmonic, 0.0)
+
+    for end, (h0, h1, d0, d1) in (
+        (0, (h[0], h[1], delta[:, 0], delta[:, 1])),
+        (-1, (h[-1], h[-2], delta[:, -1], delta[:, -2])),
+    ):
+        m = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        m = np.where(np.sign(m) != np.sign(d0), 0.0, m)
+        m = np.where((np.sign(d0) != np.sign(d1)) & (np.abs(m) > np.abs(3 * d0)), 3 * d0, m)
+        slopes[:, end] = m
+    return slopes
+
+
+def _resample_block(x, y, grid, method):
+    # x: (k,) known distances, y: (n, k) diameters with no gaps, grid: (g,)
+    out = np.full((y.shape[0], grid.size), np.nan)
+    inside = (grid >= x[0]) & (grid <= x[-1])
+    if x.size < 2 or not inside.any():
+        if x.size == 1:
+            out[:, grid == x[0]] = y[:, :1]
+        return out
+    g = grid[inside]
+    idx = np.clip(np.searchsorted(x, g, side="right") - 1, 0, x.size - 2)
+    h = x[idx + 1] - x[idx]
+    t = (g - x[idx]) / h
+    y0, y1 = y[:, idx], y[:, idx + 1]
+    if method == "linear":
+        out[:, inside] = y0 + (y1 - y0) * t
+        return out
+    slopes = _pchip_slopes(x, y)
+    m0, m1 = slopes[:, idx], slopes[:, idx + 1]
+    t2, t3 = t * t, t * t * t
+    out[:, inside] = (
+        (2 * t3 - 3 * t2 + 1) * y0
+        + (t3 - 2 * t2 + t) * h * m0
+        + (-2 * t3 + 3 * t2) * y1
+        + (t3 - t2) * h * m1
+    )
+    return out
+
+
+def resample_profiles(distances, values, grid, method="spline"):
+    # Resample every row of `values` onto `grid`. Rows sharing the same set of
+    # measured distances are interpolated together in one vectorized block.
+    distances = np.asarray(distances, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    grid = np.asarray(grid, dtype=float)
+    order = np.argsort(distances)
+    distances, values = distances[order], values[:, order]
+
+    out = np.full((values.shape[0], grid.size), np.nan)
+    masks = ~np.isnan(values)
+    patterns, inverse = np.unique(masks, axis=0, return_inverse=True)
+    for p_idx, pattern in enumerate(patterns):
+        sel = np.flatnonzero(inverse.ravel() == p_idx)
+        if pattern.any():
+            out[sel] = _resample_block(distances[pattern], values[sel][:, pattern], grid, method)
+    return out
+
+
+def resample_grid(distances, step=RESAMPLE_STEP):
+    lo, hi = min(distances), max(distances)
+    return np.unique(np.append(np.arange(lo, hi, step, dtype=float), [float(d) for d in distances]))
+
+
+def resample_rows(distances, values, method="spline", step=RESAMPLE_STEP):
+    # Every measured row on one common grid, in a single vectorized pass
+    grid = resample_grid(distances, step)
+    return grid, resample_profiles(distances, values, grid, method)
+
+
+def profile_deltas(roll_id, labels, grid, curves, baseline):
+    # Difference of every resampled row against the baseline row; rows that share
+    # no span with the baseline are skipped
+    deltas = curves - curves[baseline]
+    results = []
+    for i, label in enumerate(labels):
+        valid = ~np.isnan(deltas[i])
+        if i == baseline or not valid.any():
+            continue
+        delta = deltas[i][valid]
+        results.append({
+            "roll": roll_id,
+            "before": labels[baseline],
+            "after": label,
+            "grid": grid,
+            "before_curve": curves[baseline],
+            "after_curve": curves[i],
+            "delta": deltas[i],
+            "removed_stock_mean": float(-delta.mean()),
+            "removed_stock_max": float(-delta.min()),
+            "max_deviation": float(np.abs(delta - delta.mean()).max()),
+        })
+    return results
+
+
+def delta_frame(results):
+    frames = []
+    for res in results:
+        frames.append(pd.DataFrame({
+            "Comparison": f"{res['after']} vs {res['before']}",
+            "Distance": res["grid"],
+            "Before": res["before_curve"],
+            "After": res["after_curve"],
+            "Delta": res["delta"],
+        }))
+    return pd.concat(frames, ignore_index=True).dropna(subset=["Delta"])
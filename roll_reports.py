@@ -0,0 +1,291 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+
+from roll_core import MIN_DIA
+from roll_profiles import profile_matrix
+
+# --- Report Config ---
+REPORT_VERSION = 1  # bump when the layout changes so cached reports are rebuilt
+REPORT_CACHE_DIR = Path(tempfile.gettempdir()) / "roll_reports"
+REPORT_CACHE_MAX_FILES = 500
+REPORT_TIMEOUT = 120  # seconds to wait for the next report before giving up on the workers
+REPORT_FORMATS = {"Word (.docx)": "docx", "PDF (.pdf)": "pdf"}
+REPORT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+ZIP_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+
+def roll_payload(rows, roll_col, date_col, distance_cols):
+    # Plain, picklable snapshot of one roll's rows for the worker processes
+    rows = rows.sort_values(date_col, kind="stable")
+    columns = [c for c in rows.columns if not str(c).startswith("_")]
+    values = profile_matrix(rows, [c for _, c in distance_cols])
+    dates = rows[date_col].astype(str).str.slice(0, 10)
+    return {
+        "roll": str(rows[roll_col].iloc[0]),
+        "columns": [str(c) for c in columns],
+        "rows": rows[columns].astype(str).values.tolist(),
+        "dates": dates.tolist(),
+        "distances": [d for d, _ in distance_cols],
+        "values": np.where(np.isnan(values), None, values.round(3)).tolist(),
+    }
+
+
+def report_key(payload, fmt):
+    blob = json.dumps([REPORT_VERSION, fmt, payload], sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()
+
+
+def _safe_name(roll):
+    return "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in roll) or "roll"
+
+
+def _archive_names(keyed, fmt):
+    # Zip entry per report key. Rolls like "R/1" and "R_1" sanitize to the same
+    # name, so later ones get a numeric suffix instead of a duplicate entry.
+    names, used = {}, set()
+    for p, k in keyed:
+        base = _safe_name(p["roll"])
+        name, n = f"{base}_report.{fmt}", 1
+        while name in used:
+            n += 1
+            name = f"{base}_{n}_report.{fmt}"
+        used.add(name)
+        names[k] = name
+    return names
+
+
+# --- Charts ---
+def render_charts(payload):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    distances = payload["distances"]
+    values = np.array(payload["values"], dtype=float)
+
+    fig, ax = plt.subplots(figsize=(7, 3.4), dpi=120)
+    for label, profile in zip(payload["dates"], values):
+        mask = ~np.isnan(profile)
+        if mask.any():
+            ax.plot(np.array(distances)[mask], profile[mask], marker="o", linewidth=1.5, label=label)
+    ax.set_title(f"Roll Profile — {payload['roll']}")
+    ax.set_xlabel("Distance (mm)")
+    ax.set_ylabel("Diameter (mm)")
+    ax.set_xticks(distances)
+    ax.grid(alpha=0.3)
+    if len(payload["dates"]) <= 12:
+        ax.legend(fontsize=7, loc="best")
+    profile_png = BytesIO()
+    fig.tight_layout()
+    fig.savefig(profile_png, format="png")
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(7, 3.0), dpi=120)
+    with np.errstate(all="ignore"):
+        mean_dia = np.nanmean(values, axis=1) if values.size else values
+    ax.plot(range(len(mean_dia)), mean_dia, marker="o", color="#1f77b4", label="Mean diameter")
+    ax.axhline(MIN_DIA, color="#d62728", linestyle="--", linewidth=1, label=f"Scrap ({MIN_DIA:.0f} mm)")
+    ax.set_xticks(range(len(mean_dia)))
+    ax.set_xticklabels(payload["dates"], rotation=45, ha="right", fontsize=7)
+    ax.set_title("Wear History")
+    ax.set_ylabel("Diameter (mm)")
+    ax.grid(alpha=0.3)
+    ax.legend(fontsize=7, loc="best")
+    wear_png = BytesIO()
+    fig.tight_layout()
+    fig.savefig(wear_png, format="png")
+    plt.close(fig)
+
+    return profile_png.getvalue(), wear_png.getvalue()
+
+
+def roll_metadata(payload):
+    values = np.array(payload["values"], dtype=float)
+    with np.errstate(all="ignore"):
+        mean_dia = np.nanmean(values, axis=1) if values.size else np.array([])
+    finite = mean_dia[np.isfinite(mean_dia)]
+    return [
+        ("Roll No", payload["roll"]),
+        ("Measurements", str(len(payload["rows"]))),
+        ("First / Last Date", f"{payload['dates'][0]} / {payload['dates'][-1]}" if payload["dates"] else "-"),
+        ("Latest Min Diameter (mm)", f"{np.nanmin(values[-1]):.2f}" if values.size and np.isfinite(values[-1]).any() else "-"),
+        ("Total Wear (mm)", f"{finite[0] - finite[-1]:.3f}" if finite.size > 1 else "-"),
+    ]
+
+
+# --- Documents ---
+def build_docx(payload):
+    from docx import Document
+    from docx.shared import Inches
+
+    profile_png, wear_png = render_charts(payload)
+    doc = Document()
+    doc.add_heading(f"Roll Report — {payload['roll']}", level=1)
+
+    meta = doc.add_table(rows=0, cols=2)
+    meta.style = "Table Grid"
+    for label, value in roll_metadata(payload):
+        cells = meta.add_row().cells
+        cells[0].text = label
+        cells[1].text = value
+
+    doc.add_heading("Profile", level=2)
+    doc.add_picture(BytesIO(profile_png), width=Inches(6.2))
+    doc.add_heading("Wear", level=2)
+    doc.add_picture(BytesIO(wear_png), width=Inches(6.2))
+
+    doc.add_heading("Measurement History", level=2)
+    table = doc.add_table(rows=1, cols=len(payload["columns"]))
+    table.style = "Table Grid"
+    for i, col in enumerate(payload["columns"]):
+        table.rows[0].cells[i].text = col
+    for r in payload["rows"]:
+        cells = table.add_row().cells
+        for j, value in enumerate(r):
+            cells[j].text = value
+
+    out = BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def build_pdf(payload):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.image as mpimg
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    profile_png, wear_png = render_charts(payload)
+    out = BytesIO()
+    with PdfPages(out) as pdf:
+        fig = plt.figure(figsize=(8.27, 11.69))
+        fig.suptitle(f"Roll Report — {payload['roll']}", fontsize=16, fontweight="bold", y=0.97)
+        meta_ax = fig.add_axes([0.08, 0.80, 0.84, 0.13])
+        meta_ax.axis("off")
+        meta_ax.table(cellText=[[k, v] for k, v in roll_metadata(payload)], cellLoc="left", loc="center",
+                      colWidths=[0.45, 0.55])
+        for rect, png in (([0.05, 0.43, 0.9, 0.35], profile_png), ([0.05, 0.05, 0.9, 0.35], wear_png)):
+            ax = fig.add_axes(rect)
+            ax.imshow(mpimg.imread(BytesIO(png), format="png"))
+            ax.axis("off")
+        pdf.savefig(fig)
+        plt.close(fig)
+
+        page_rows = 40
+        for start in range(0, max(len(payload["rows"]), 1), page_rows):
+            fig = plt.figure(figsize=(11.69, 8.27))
+            ax = fig.add_axes([0.03, 0.03, 0.94, 0.88])
+            ax.axis("off")
+            ax.set_title("Measurement History", fontsize=12, fontweight="bold")
+            chunk = payload["rows"][start:start + page_rows] or [[""] * len(payload["columns"])]
+            tbl = ax.table(cellText=chunk, colLabels=payload["columns"], loc="upper center", cellLoc="center")
+            tbl.auto_set_font_size(False)
+            tbl.set_fontsize(7)
+            pdf.savefig(fig)
+            plt.close(fig)
+    return out.getvalue()
+
+
+_BUILDERS = {"docx": build_docx, "pdf": build_pdf}
+
+
+def render_report(payload, fmt, key, cache_dir=REPORT_CACHE_DIR):
+    # Worker entry point: build one report and store it under its data hash
+    data = _BUILDERS[fmt](payload)
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_dir / f"{key}.{fmt}.{os.getpid()}.tmp"
+    tmp.write_bytes(data)
+    tmp.replace(cache_dir / f"{key}.{fmt}")
+    return key
+
+
+def _render_job(job):
+    return render_report(*job)
+
+
+def _touch(path):
+    # Marks a cached report as recently used; False if it is not cached
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def evict_reports(cache_dir=REPORT_CACHE_DIR, max_files=REPORT_CACHE_MAX_FILES):
+    # Keep the most recently used reports; also clear temp files left by killed workers
+    cache_dir = Path(cache_dir)
+    files = []
+    for p in cache_dir.glob("*"):
+        try:
+            mtime = p.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if p.suffix == ".tmp":
+            if time.time() - mtime > REPORT_TIMEOUT:
+                p.unlink(missing_ok=True)
+        elif p.suffix.lstrip(".") in REPORT_FORMATS.values():
+            files.append((mtime, p))
+    if len(files) <= max_files:
+        return
+    files = [p for _, p in sorted(files)]
+    for stale in files[:len(files) - max_files]:
+        stale.unlink(missing_ok=True)
+
+
+def build_report_pack(payloads, fmt, max_workers=REPORT_WORKERS, cache_dir=REPORT_CACHE_DIR, progress=None):
+    # Zip of one report per roll. Cached reports are reused; the rest are rendered
+    # in worker processes and added to the zip as each one finishes. Raises
+    # TimeoutError if no report finishes within REPORT_TIMEOUT seconds.
+    cache_dir = Path(cache_dir)
+    keyed = [(p, report_key(p, fmt)) for p in payloads]
+    cached = {k for _, k in keyed if _touch(cache_dir / f"{k}.{fmt}")}
+    missing = [(p, k) for p, k in keyed if k not in cached]
+    names = _archive_names(keyed, fmt)
+
+    out = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_BYTES)
+    done = 0
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for k in cached:
+            zf.write(cache_dir / f"{k}.{fmt}", names[k])
+            done += 1
+            if progress:
+                progress(done, len(keyed))
+
+        if missing:
+            # fork, not spawn: under Streamlit __main__ is the app script, and spawn
+            # would re-run the whole app in every worker. The server process also runs
+            # other threads (web server, thumbnail renderer); a lock one of them holds
+            # at fork time stays held in the child, so a worker can hang. The timeout
+            # bounds that: hung workers are killed and the session gets an error.
+            ctx = multiprocessing.get_context("fork")
+            pool = ctx.Pool(processes=min(max_workers, len(missing)))
+            try:
+                results = pool.imap_unordered(_render_job, [(p, fmt, k, str(cache_dir)) for p, k in missing])
+                for _ in missing:
+                    try:
+                        k = results.next(timeout=REPORT_TIMEOUT)
+                    except multiprocessing.TimeoutError:
+                        raise TimeoutError(f"No report finished within {REPORT_TIMEOUT} s") from None
+                    zf.write(cache_dir / f"{k}.{fmt}", names[k])
+                    done += 1
+                    if progress:
+                        progress(done, len(keyed))
+            finally:
+                pool.terminate()
+                pool.join()
+
+    evict_reports(cache_dir)
+    out.seek(0)
+    return out
@@ -0,0 +1,150 @@
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from roll_core import DISTANCES, MIN_DIA, MAX_DIA, distance_columns
+
+# --- Rollup Config ---
+ROLLUP_DIMENSIONS = {"Stand": "stand", "Position": "position", "Crown": "crown"}
+HIST_STEP = 10.0
+HIST_EDGES = np.arange(MIN_DIA, MAX_DIA + HIST_STEP, HIST_STEP)
+
+
+def _hist_bin(value):
+    if not np.isfinite(value):
+        return None
+    return int(np.clip(np.searchsorted(HIST_EDGES, value, side="right") - 1, 0, len(HIST_EDGES) - 2))
+
+
+class ShopRollups:
+    # Per stand/position/crown aggregates kept as mergeable running sums
+    # (count, sum, sum of squares per distance, offset by MIN_DIA) so rows can be
+    # added or removed without regrouping the table.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.row_counts = Counter()  # row hash -> occurrences in the sheet
+        self.row_data = {}  # row hash -> (roll, date, labels, values)
+        self.roll_rows = {}  # roll -> Counter of row hashes
+        self.latest = {}  # roll -> (labels, hist bin) currently counted
+        n_dist = len(DISTANCES)
+        self.sums = {dim: {} for dim in ROLLUP_DIMENSIONS}  # dim -> label -> (3, n_dist)
+        self.entries = {dim: Counter() for dim in ROLLUP_DIMENSIONS}
+        self.hist = {dim: {} for dim in ROLLUP_DIMENSIONS}  # dim -> label -> bin counts
+        self._zero = lambda: np.zeros((3, n_dist))
+
+    # --- Sync ---
+    def sync(self, frame):
+        # Diff the sheet against what is already aggregated and apply only the delta
+        if frame.empty or "Roll No" not in frame.columns:
+            frame = pd.DataFrame(columns=["Date", "Roll No"] + list(ROLLUP_DIMENSIONS.values()))
+        found = dict(distance_columns(frame.columns))
+        dist_cols = [found.get(d) for d in DISTANCES]
+        cols = ["Date", "Roll No"] + list(ROLLUP_DIMENSIONS.values())
+        frame = frame.reindex(columns=cols + [c for c in dist_cols if c is not None])
+        hashes = pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+        current = Counter(hashes.tolist())
+
+        with self.lock:
+            added = current - self.row_counts
+            removed = self.row_counts - current
+            if not added and not removed:
+                return False
+
+            touched = set()
+            for h, count in removed.items():
+                touched.add(self.row_data[h][0])
+                self._apply(self.row_data[h], -count)
+                self.roll_rows[self.row_data[h][0]][h] -= count
+                if self.row_counts[h] == count:
+                    del self.row_data[h]
+
+            if added:
+                first = pd.Series(range(len(hashes)), index=hashes)
+                first = first[~first.index.duplicated()]
+                added_hashes = list(added)
+                pos = first.loc[added_hashes].to_numpy()
+                sub = frame.iloc[pos]
+                values = np.full((len(sub), len(DISTANCES)), np.nan)
+                for j, col in enumerate(dist_cols):
+                    if col is not None:
+                        values[:, j] = pd.to_numeric(
+                            sub[col].astype(str).str.strip().str.replace(",", "", regex=False), errors="coerce"
+                        )
+                dates = pd.to_datetime(sub["Date"], errors="coerce")
+                rolls = sub["Roll No"].astype(str).str.strip().str.upper().to_numpy()
+                labels = [sub[c].astype(str).str.strip().to_numpy() for c in ROLLUP_DIMENSIONS.values()]
+                for i, h in enumerate(added_hashes):
+                    record = (rolls[i], dates.iloc[i], tuple(lab[i] for lab in labels), values[i])
+                    self.row_data[h] = record
+                    self._apply(record, added[h])
+                    self.roll_rows.setdefault(rolls[i], Counter())[h] += added[h]
+                    touched.add(rolls[i])
+
+            self.row_counts = current
+            for roll in touched:
+                self._refresh_latest(roll)
+            self.version += 1
+            return True
+
+    def _apply(self, record, count):
+        _, _, labels, values = record
+        mask = ~np.isnan(values)
+        shifted = np.where(mask, values - MIN_DIA, 0.0)
+        delta = np.stack([mask.astype(float), shifted, shifted * shifted]) * count
+        for dim, label in zip(ROLLUP_DIMENSIONS, labels):
+            acc = self.sums[dim].setdefault(label, self._zero())
+            acc += delta
+            self.entries[dim][label] += count
+            if self.entries[dim][label] <= 0:
+                del self.entries[dim][label]
+                del self.sums[dim][label]
+
+    def _refresh_latest(self, roll):
+        # Move the roll's contribution in the latest-diameter histogram
+        old = self.latest.pop(roll, None)
+        if old is not None:
+            labels, b = old
+            for dim, label in zip(ROLLUP_DIMENSIONS, labels):
+                self.hist[dim][label][b] -= 1
+
+        rows = self.roll_rows.get(roll)
+        if rows is not None:
+            rows += Counter()  # drop zero counts
+        if not rows:
+            self.roll_rows.pop(roll, None)
+            return
+        records = [self.row_data[h] for h in rows]
+        newest = max(records, key=lambda r: (pd.notna(r[1]), r[1] if pd.notna(r[1]) else pd.Timestamp.min))
+        b = _hist_bin(np.nanmean(newest[3]) if (~np.isnan(newest[3])).any() else np.nan)
+        if b is None:
+            return
+        for dim, label in zip(ROLLUP_DIMENSIONS, newest[2]):
+            self.hist[dim].setdefault(label, np.zeros(len(HIST_EDGES) - 1, dtype=int))[b] += 1
+        self.latest[roll] = (newest[2], b)
+
+    # --- Read ---
+    def summary(self, dim):
+        with self.lock:
+            rows = []
+            for label, (n, s1, s2) in sorted(self.sums[dim].items()):
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    mean = np.where(n > 0, s1 / n, np.nan)
+                    var = np.where(n > 1, (s2 - n * mean * mean) / (n - 1), np.nan)
+                record = {dim: label, "Measurements": int(self.entries[dim][label])}
+                record.update({f"{d} mean": MIN_DIA + m for d, m in zip(DISTANCES, mean)})
+                record["Spread (mm)"] = float(np.sqrt(np.nanmean(np.clip(var, 0, None)))) if np.isfinite(var).any() else np.nan
+                rows.append(record)
+            return pd.DataFrame(rows)
+
+    def latest_distribution(self, dim):
+        with self.lock:
+            rows = []
+            for label, counts in sorted(self.hist[dim].items()):
+                for lo, c in zip(HIST_EDGES[:-1], counts):
+                    if c:
+                        rows.append({dim: label, "Latest Diameter (mm)": f"{lo:.0f}–{lo + HIST_STEP:.0f}", "Rolls": int(c)})
+            return pd.DataFrame(rows)
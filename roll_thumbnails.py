@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import queue
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+
+# --- Thumbnail Config ---
+THUMB_VERSION = 1  # bump when the sparkline style changes
+THUMB_CACHE_DIR = Path(tempfile.gettempdir()) / "roll_thumbnails"
+THUMB_CACHE_MAX_FILES = 2000
+THUMB_SIZE = (1.8, 0.6)  # inches
+THUMB_DPI = 100
+
+log = logging.getLogger("roll_thumbnails")
+
+
+def thumbnail_key(roll, date_label, values):
+    # Changes only when the roll's latest row changes
+    blob = repr((THUMB_VERSION, str(roll), str(date_label), [None if np.isnan(v) else round(float(v), 3) for v in values]))
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def render_sparkline(distances, values):
+    # Object API instead of pyplot so rendering is safe off the script thread
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=THUMB_SIZE, dpi=THUMB_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0.02, 0.08, 0.96, 0.84])
+    distances = np.asarray(distances, dtype=float)
+    values = np.asarray(values, dtype=float)
+    mask = ~np.isnan(values)
+    if mask.any():
+        ax.plot(distances[mask], values[mask], color="#1f77b4", linewidth=1.5, marker="o", markersize=2)
+        lo, hi = values[mask].min(), values[mask].max()
+        pad = (hi - lo) * 0.15 or 0.3
+        ax.set_ylim(lo - pad, hi + pad)
+    ax.set_xlim(distances.min(), distances.max())
+    ax.axis("off")
+    out = BytesIO()
+    fig.savefig(out, format="png", transparent=True)
+    return out.getvalue()
+
+
+class ThumbnailCache:
+    # Disk cache of sparkline PNGs keyed by (roll, latest row hash), filled by a
+    # background thread. Reads touch the file so eviction drops the least recently used.
+
+    def __init__(self, cache_dir=THUMB_CACHE_DIR, max_files=THUMB_CACHE_MAX_FILES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_files = max_files
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.failed = set()  # keys whose render raised; not retried until the row changes
+        self.jobs = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="thumbnail-renderer", daemon=True)
+        self.worker.start()
+
+    def path(self, key):
+        return self.cache_dir / f"{key}.png"
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return str(path)
+
+    def request(self, key, distances, values):
+        # Returns the cached file path, or queues a render and returns None
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        with self.lock:
+            if key not in self.pending and key not in self.failed:
+                self.pending.add(key)
+                self.jobs.put((key, list(distances), list(values)))
+        return None
+
+    def pending_count(self):
+        with self.lock:
+            return len(self.pending)
+
+    def has_failed(self, key):
+        with self.lock:
+            return key in self.failed
+
+    def _run(self):
+        written = 0
+        while True:
+            key, distances, values = self.jobs.get()
+            try:
+                png = render_sparkline(distances, values)
+                tmp = self.path(key).with_suffix(f".{threading.get_ident()}.tmp")
+                tmp.write_bytes(png)
+                tmp.replace(self.path(key))
+                written += 1
+                if written % 50 == 0 or self.jobs.empty():
+                    self._evict()
+            except Exception:
+                log.exception("Thumbnail render failed for %s", key)
+                with self.lock:
+                    self.failed.add(key)
+            finally:
+                with self.lock:
+                    self.pending.discard(key)
+
+    def _evict(self):
+        files = []
+        for p in self.cache_dir.glob("*.png"):
+            try:
+                files.append((p.stat().st_mtime, p))
+            except FileNotFoundError:
+                continue
+        if len(files) <= self.max_files:
+            return
+        files = [p for _, p in sorted(files)]
+        for stale in files[:len(files) - self.max_files]:
+            stale.unlink(missing_ok=True)
@@ -3,11 +3,18 @@ import pandas as pd
 from io import BytesIO
 from docx import Document
 from datetime import date as dt_date
-import gspread
-from google.oauth2.service_account import Credentials
 import altair as alt
-import re
 import matplotlib.pyplot as plt
+from roll_core import (
+    DISTANCES, MIN_DIA, STANDS, POSITIONS, CROWNS, KEY_COLUMNS,
+    open_sheet, validate_entry, entry_row, record_keys, build_key_index, distance_columns,
+)
+from roll_export import EXPORT_FORMATS, filter_frame, export_table
+from roll_forecast import ForecastCache
+from roll_profiles import RESAMPLE_STEP, RESAMPLE_METHODS, profile_matrix, resample_rows, profile_deltas, delta_frame
+from roll_rollups import ROLLUP_DIMENSIONS, ShopRollups
+from roll_reports import REPORT_FORMATS, roll_payload, build_report_pack
+from roll_thumbnails import ThumbnailCache, thumbnail_key
 
 # Hide Streamlit UI elements
 hide_streamlit_ui = """
@@ -211,21 +218,59 @@ st.markdown(custom_css, unsafe_allow_html=True)
 st.set_page_config(layout="wide", page_title="Roll Profile Data Entry")
 
 # --- Google Sheets Config ---
-SHEET_NAME = "Roll_Data"
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds_dict = st.secrets["gcp_service_account"]
-creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPE)
-client = gspread.authorize(creds)
-sheet = client.open(SHEET_NAME).sheet1
-
-# --- Roll Config ---
-DISTANCES = [100, 350, 600, 850, 1100, 1350, 1600]
-MIN_DIA = 1245.0
-MAX_DIA = 1352.0
+sheet = open_sheet(st.secrets["gcp_service_account"])
+
+# --- Sheet Cache ---
+SHEET_CACHE_TTL = 30
+
+
+@st.cache_resource
+def shop_rollups():
+    return ShopRollups()
+
+
+@st.cache_resource
+def thumbnail_cache():
+    return ThumbnailCache()
+
+
+@st.cache_data(ttl=SHEET_CACHE_TTL, show_spinner=False)
+def load_sheet():
+    frame = pd.DataFrame(sheet.get_all_records())
+    # Runs only when the sheet is actually re-read; applies just the changed rows
+    shop_rollups().sync(frame)
+    return frame, build_key_index(frame)
+
+
+def reload_sheet():
+    load_sheet.clear()
+    return load_sheet()
+
+
+def row_matches(frame, row_idx, expected):
+    # Positions from the cached frame shift when another client (the ingestion
+    # API, a direct sheet edit) adds or removes rows; check a freshly read frame
+    # still has the expected entry at row_idx before writing to it
+    if row_idx >= len(frame):
+        return False
+    if any(c not in frame.columns for c in KEY_COLUMNS):
+        return True
+    return record_keys(frame.iloc[[row_idx]]).iloc[0] == record_keys(expected).iloc[0]
+
+
+# --- Profile Engine ---
+@st.cache_data(show_spinner=False)
+def resample_roll_rows(roll_id, row_labels, distances, values, method="spline", step=RESAMPLE_STEP):
+    # Cached per (roll, row set); the measured values are part of the key so
+    # an edited row is recomputed instead of served stale.
+    return resample_rows(distances, values, method, step)
+
+
+# --- Remaining Life Forecast ---
+@st.cache_resource
+def forecast_cache():
+    return ForecastCache()
+
 
 # Link to DC Roll app
 st.markdown("""
@@ -255,8 +300,7 @@ st.markdown("""
 
 
 # Load existing data
-existing_data = sheet.get_all_records()
-df = pd.DataFrame(existing_data)
+df, key_index = load_sheet()
 
 # --- Entry Form ---
 form_diameters = {}
@@ -271,13 +315,13 @@ with st.container():
         with col2:
             roll_no = st.text_input("🏷️ Roll No (required)").strip().upper()
         with col3:
-            stand = st.selectbox(" Stand", ['Select', 'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'ROUGHING', 'DC'], index=0)
+            stand = st.selectbox(" Stand", ['Select'] + STANDS, index=0)
 
         col1, col2 = st.columns(2)
         with col1:
-            position = st.selectbox("📍 Position", ['Select', 'TOP', 'BOTTOM'], index=0)
+            position = st.selectbox("📍 Position", ['Select'] + POSITIONS, index=0)
         with col2:
-            crown = st.selectbox(" Crown", ['Select', 'STRAIGHT', '+100µ', '+200µ'], index=0)
+            crown = st.selectbox(" Crown", ['Select'] + CROWNS, index=0)
 
         st.markdown('<p class="diameter-label">📏 Diameters (mm) — must be between 1245 and 1352</p>', unsafe_allow_html=True)
         
@@ -289,45 +333,42 @@ with st.container():
             except ValueError:
                 form_diameters[d] = 0
 
+        on_duplicate = st.radio(
+            "If this Roll No / Date / Stand / Position already exists",
+            ["Warn", "Update existing row"],
+            horizontal=True,
+        )
+
         submitted = st.form_submit_button("💾 Save Entry", use_container_width=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
 
 # --- Save Entry ---
 if submitted:
-    errors = []
-
-    if roll_no == "":
-        errors.append("❌ Roll No cannot be empty")
-    
-    if stand == "Select":
-        errors.append("❌ Please select a Stand")
-    
-    if position == "Select":
-        errors.append("❌ Please select a Position")
-    
-    if crown == "Select":
-        errors.append("❌ Please select a Crown type")
-
-    filtered_diameters = {}
-    for d, v in form_diameters.items():
-        if v == 0:
-            continue
-        if not (MIN_DIA <= v <= MAX_DIA):
-            errors.append(f"❌ {d} mm value {v} out of range [{MIN_DIA}-{MAX_DIA}]")
-        else:
-            filtered_diameters[d] = v
+    filtered_diameters, errors = validate_entry(roll_no, stand, position, crown, form_diameters)
 
     if errors:
         for e in errors:
-            st.error(e)
+            st.error(f"❌ {e}")
     else:
-        row = [str(entry_date), roll_no, stand, position, crown] + [filtered_diameters.get(d, "") for d in DISTANCES]
-        sheet.append_row(row)
-        st.success(f"✅ Entry saved for Roll No: {roll_no}")
+        row = entry_row(entry_date, roll_no, stand, position, crown, filtered_diameters)
+        existing_row = key_index.get((str(entry_date), roll_no, stand, position))
 
-        existing_data = sheet.get_all_records()
-        df = pd.DataFrame(existing_data)
+        if existing_row is not None and on_duplicate == "Warn":
+            st.warning(f"⚠️ Roll No {roll_no} ({stand} {position}) on {entry_date} already exists at Row {existing_row - 1}. Choose 'Update existing row' to overwrite it.")
+        else:
+            if existing_row is not None:
+                # Look the row up again in a fresh read; the cached index may be stale
+                df, key_index = reload_sheet()
+                existing_row = key_index.get((str(entry_date), roll_no, stand, position))
+            if existing_row is not None:
+                sheet.update(range_name=f"A{existing_row}", values=[row])
+                st.success(f"✅ Existing Row {existing_row - 1} updated for Roll No: {roll_no}")
+            else:
+                sheet.append_row(row)
+                st.success(f"✅ Entry saved for Roll No: {roll_no}")
+
+            df, key_index = reload_sheet()
 
 # --- Show Data ---
 with st.container():
@@ -360,6 +401,35 @@ with st.container():
         st.markdown('</div>', unsafe_allow_html=True)
 
         st.markdown(f"<p style='text-align: center; color: #666; font-size: 0.9rem; margin: 1rem 0;'>Page {page} of {total_pages} | Total entries: {len(df_display)}</p>", unsafe_allow_html=True)
+
+        # --- Duplicate Check ---
+        if all(c in df_display.columns for c in KEY_COLUMNS):
+            dup_mask = record_keys(df_display).duplicated(keep="last")
+            if dup_mask.any():
+                with st.expander(f"🧹 {int(dup_mask.sum())} duplicate entries found"):
+                    st.caption("Rows sharing Roll No, Date, Stand and Position with a later row. The latest row is kept.")
+                    st.dataframe(df_display[dup_mask], use_container_width=True)
+                    if st.button("🗑️ Remove Duplicates", use_container_width=True):
+                        # Recompute the duplicates from a fresh read so the deleted positions are current
+                        fresh_df, _ = reload_sheet()
+                        if all(c in fresh_df.columns for c in KEY_COLUMNS):
+                            dup_mask = record_keys(fresh_df).duplicated(keep="last")
+                        else:
+                            dup_mask = pd.Series(False, index=fresh_df.index)
+                        if dup_mask.any():
+                            # Delete bottom-up in a single batch request so row numbers stay valid
+                            sheet.spreadsheet.batch_update({"requests": [
+                                {"deleteDimension": {"range": {
+                                    "sheetId": sheet.id,
+                                    "dimension": "ROWS",
+                                    "startIndex": int(i) + 1,
+                                    "endIndex": int(i) + 2,
+                                }}}
+                                for i in sorted(fresh_df.index[dup_mask], reverse=True)
+                            ]})
+                        st.success(f"✅ Removed {int(dup_mask.sum())} duplicate entries")
+                        df, key_index = reload_sheet()
+                        st.rerun()
  # --- Edit/Delete Section ---
         st.markdown("### ✏️ Edit or Delete Entry")
         
@@ -385,13 +455,16 @@ with st.container():
                         st.session_state.confirm_delete = selected_idx
                         st.warning(f"⚠️ Click 'Delete This Row' again to confirm deletion of Row {selected_idx + 1}")
                     else:
-                        # Delete from Google Sheets (row index + 2 because of header row and 0-indexing)
-                        sheet.delete_rows(selected_idx + 2)
-                        st.success(f"✅ Row {selected_idx + 1} deleted successfully!")
                         st.session_state.confirm_delete = None
-                        existing_data = sheet.get_all_records()
-                        df = pd.DataFrame(existing_data)
-                        st.rerun()
+                        df, key_index = reload_sheet()
+                        if not row_matches(df, selected_idx, df_display.iloc[[selected_idx]]):
+                            st.error(f"❌ Row {selected_idx + 1} changed since the table was loaded. Data refreshed; select the row again.")
+                        else:
+                            # Delete from Google Sheets (row index + 2 because of header row and 0-indexing)
+                            sheet.delete_rows(selected_idx + 2)
+                            st.success(f"✅ Row {selected_idx + 1} deleted successfully!")
+                            df, key_index = reload_sheet()
+                            st.rerun()
         
         # --- Edit Form ---
         if st.session_state.get('editing_row') is not None:
@@ -411,19 +484,19 @@ with st.container():
                     edit_roll_no = st.text_input("🏷️ Roll No", value=str(edit_data.get('Roll No', ''))).strip().upper()
                 with col3:
                     current_stand = edit_data.get('stand', 'Select')
-                    stand_options = ['Select', 'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'ROUGHING', 'DC']
+                    stand_options = ['Select'] + STANDS
                     stand_idx = stand_options.index(current_stand) if current_stand in stand_options else 0
                     edit_stand = st.selectbox("🏭 Stand", stand_options, index=stand_idx)
                 
                 col1, col2 = st.columns(2)
                 with col1:
                     current_position = edit_data.get('position', 'Select')
-                    position_options = ['Select', 'TOP', 'BOTTOM']
+                    position_options = ['Select'] + POSITIONS
                     position_idx = position_options.index(current_position) if current_position in position_options else 0
                     edit_position = st.selectbox("📍 Position", position_options, index=position_idx)
                 with col2:
                     current_crown = edit_data.get('crown', 'Select')
-                    crown_options = ['Select', 'STRAIGHT', '+100µ', '+200µ']
+                    crown_options = ['Select'] + CROWNS
                     crown_idx = crown_options.index(current_crown) if current_crown in crown_options else 0
                     edit_crown = st.selectbox("👑 Crown", crown_options, index=crown_idx)
                 
@@ -457,54 +530,32 @@ with st.container():
                     st.rerun()
                 
                 if update_submitted:
-                    errors = []
-                    
-                    if edit_roll_no == "":
-                        errors.append("❌ Roll No cannot be empty")
-                    
-                    if edit_stand == "Select":
-                        errors.append("❌ Please select a Stand")
-                    
-                    if edit_position == "Select":
-                        errors.append("❌ Please select a Position")
-                    
-                    if edit_crown == "Select":
-                        errors.append("❌ Please select a Crown type")
-                    
-                    filtered_edit_diameters = {}
-                    for d, v in edit_diameters.items():
-                        if v == 0:
-                            continue
-                        if not (MIN_DIA <= v <= MAX_DIA):
-                            errors.append(f"❌ {d} mm value {v} out of range [{MIN_DIA}-{MAX_DIA}]")
-                        else:
-                            filtered_edit_diameters[d] = v
-                    
+                    filtered_edit_diameters, errors = validate_entry(
+                        edit_roll_no, edit_stand, edit_position, edit_crown, edit_diameters
+                    )
+
                     if errors:
                         for e in errors:
-                            st.error(e)
+                            st.error(f"❌ {e}")
                     else:
-                        # Update in Google Sheets (row index + 2 because of header row and 0-indexing)
-                        updated_row = [str(edit_date), edit_roll_no, edit_stand, edit_position, edit_crown] + [filtered_edit_diameters.get(d, "") for d in DISTANCES]
-                        
-                        # Update each cell in the row
-                        row_num = edit_idx + 2
-                        for col_idx, value in enumerate(updated_row, start=1):
-                            sheet.update_cell(row_num, col_idx, value)
-                        
-                        st.success(f"✅ Row {edit_idx + 1} updated successfully!")
-                        st.session_state.editing_row = None
-                        st.session_state.edit_data = None
-                        existing_data = sheet.get_all_records()
-                        df = pd.DataFrame(existing_data)
-                        st.rerun()
+                        df, key_index = reload_sheet()
+                        if not row_matches(df, edit_idx, pd.DataFrame([edit_data])):
+                            st.error(f"❌ Row {edit_idx + 1} changed since it was opened for editing. Data refreshed; cancel and select the row again.")
+                        else:
+                            # Update in Google Sheets (row index + 2 because of header row and 0-indexing)
+                            updated_row = entry_row(edit_date, edit_roll_no, edit_stand, edit_position, edit_crown, filtered_edit_diameters)
+
+                            # Update each cell in the row
+                            row_num = edit_idx + 2
+                            for col_idx, value in enumerate(updated_row, start=1):
+                                sheet.update_cell(row_num, col_idx, value)
+
+                            st.success(f"✅ Row {edit_idx + 1} updated successfully!")
+                            st.session_state.editing_row = None
+                            st.session_state.edit_data = None
+                            df, key_index = reload_sheet()
+                            st.rerun()
     # --- Download Functions ---
-    def to_excel_bytes(df):
-        output = BytesIO()
-        df.to_excel(output, index=False, sheet_name="RollData")
-        output.seek(0)
-        return output.getvalue()
-
     def to_word_bytes(df):
         doc = Document()
         doc.add_heading("Roll Profile Data", level=1)
@@ -525,23 +576,43 @@ with st.container():
     # --- Download Buttons ---
     if not df.empty:
         st.markdown('<div class="download-section">', unsafe_allow_html=True)
-        col1, col2 = st.columns(2)
-        with col1:
-            st.download_button(
-                "⬇️ Download Excel",
-                data=to_excel_bytes(df),
-                file_name="roll_data.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
-        with col2:
-            st.download_button(
-                "⬇️ Download Word",
-                data=to_word_bytes(df),
-                file_name="roll_data.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                use_container_width=True
-            )
+        with st.expander("⬇️ Export Data"):
+            with st.form("export_form"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    export_format = st.selectbox("Format", list(EXPORT_FORMATS))
+                    export_stands = st.multiselect("Stands (all if empty)", STANDS)
+                with col2:
+                    export_dates = st.date_input("Date range (optional)", value=())
+                    export_columns = st.multiselect("Columns (all if empty)", list(df.columns))
+                prepare_export = st.form_submit_button("📦 Prepare Export", use_container_width=True)
+
+            if prepare_export:
+                date_from = export_dates[0] if len(export_dates) > 0 else None
+                date_to = export_dates[1] if len(export_dates) > 1 else None
+                export_df = filter_frame(df, export_columns, date_from, date_to, export_stands)
+                if export_df.empty:
+                    st.warning("No rows match the selected filters.")
+                else:
+                    ext, mime = EXPORT_FORMATS[export_format]
+                    # download_button needs bytes; the spool is read once after it is fully written
+                    with export_table(export_df, export_format) as export_file:
+                        export_bytes = export_file.read()
+                    st.download_button(
+                        f"⬇️ Download {len(export_df)} rows",
+                        data=export_bytes,
+                        file_name=f"roll_data.{ext}",
+                        mime=mime,
+                        use_container_width=True
+                    )
+
+        st.download_button(
+            "⬇️ Download Word",
+            data=to_word_bytes(df),
+            file_name="roll_data.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            use_container_width=True
+        )
         st.markdown('</div>', unsafe_allow_html=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
@@ -581,28 +652,75 @@ else:
             df_plot["_date_label"] = df_plot[date_col].astype(str)
 
         # Detect distance columns
-        desired_distances = [100, 350, 600, 850, 1100, 1350, 1600]
-        found_distance_cols = []
-        for col in norm_cols:
-            m = re.search(r"(\d+)", str(col))
-            if m:
-                try:
-                    dist = int(m.group(1))
-                except Exception:
-                    dist = None
-                if dist in desired_distances:
-                    found_distance_cols.append((dist, col))
-
-        found_distance_cols = sorted(
-            found_distance_cols, key=lambda x: desired_distances.index(x[0])
-        )
+        found_distance_cols = distance_columns(norm_cols)
 
         if not found_distance_cols:
             st.error("No distance columns (100,350,...) found in sheet.")
         else:
             # Roll selection
             roll_options = sorted(df_plot[roll_col].astype(str).unique())
-            selected_roll = st.selectbox("Select Roll No", ["-- choose --"] + roll_options)
+
+            # A roll picked in the gallery is applied before the selectbox is created
+            if "gallery_pick" in st.session_state:
+                st.session_state["selected_roll"] = st.session_state.pop("gallery_pick")
+
+            if st.toggle("🖼️ Gallery view", value=False):
+                GALLERY_COLUMNS = 6
+                GALLERY_PAGE_SIZE = 48
+                dist_values = [d for d, _ in found_distance_cols]
+                latest_rows = df_plot.sort_values(date_col, kind="stable").groupby(df_plot[roll_col].astype(str)).tail(1)
+                latest_rows = latest_rows.assign(_roll=latest_rows[roll_col].astype(str)).sort_values("_roll")
+                latest_values = profile_matrix(latest_rows, [c for _, c in found_distance_cols])
+
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    gallery_filter = st.text_input("🔎 Filter rolls", value="").strip().upper()
+                gallery_items = [
+                    (roll, label, thumbnail_key(roll, label, values), values)
+                    for roll, label, values in zip(latest_rows["_roll"], latest_rows["_date_label"], latest_values)
+                    if gallery_filter in roll.upper()
+                ]
+                gallery_pages = max(1, (len(gallery_items) - 1) // GALLERY_PAGE_SIZE + 1)
+                with col2:
+                    gallery_page = st.number_input("Gallery page", min_value=1, max_value=gallery_pages, step=1)
+                gallery_items = gallery_items[(gallery_page - 1) * GALLERY_PAGE_SIZE:gallery_page * GALLERY_PAGE_SIZE]
+
+                thumbs = thumbnail_cache()
+                still_rendering = [
+                    thumbs.request(key, dist_values, values) is None and not thumbs.has_failed(key)
+                    for _, _, key, values in gallery_items
+                ]
+                polling = any(still_rendering)
+
+                # Poll only while the background thread still has thumbnails to draw
+                @st.fragment(run_every=1.5 if polling else None)
+                def roll_gallery():
+                    rendering = 0
+                    for start in range(0, len(gallery_items), GALLERY_COLUMNS):
+                        cols = st.columns(GALLERY_COLUMNS)
+                        for col, (roll, label, key, _) in zip(cols, gallery_items[start:start + GALLERY_COLUMNS]):
+                            with col:
+                                thumb_path = thumbs.get(key)
+                                if thumb_path is not None:
+                                    st.image(thumb_path, use_container_width=True)
+                                elif thumbs.has_failed(key):
+                                    st.caption("⚠️ no preview")
+                                else:
+                                    rendering += 1
+                                    st.caption("⏳ rendering…")
+                                if st.button(roll, key=f"gallery_{roll}", help=f"Latest: {label}", use_container_width=True):
+                                    st.session_state["gallery_pick"] = roll
+                                    st.rerun()
+                    if rendering:
+                        st.caption(f"⏳ {rendering} thumbnails rendering in the background…")
+                    elif polling:
+                        # run_every is fixed when the fragment is created; a full rerun
+                        # recreates it without polling now that every thumbnail is drawn
+                        st.rerun()
+
+                roll_gallery()
+
+            selected_roll = st.selectbox("Select Roll No", ["-- choose --"] + roll_options, key="selected_roll")
 
             if selected_roll and selected_roll != "-- choose --":
                 roll_rows = df_plot[df_plot[roll_col].astype(str) == str(selected_roll)].copy()
@@ -830,23 +948,213 @@ else:
                                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                 use_container_width=True
                             )
+
+                            # --- Profile Comparison (before/after grind) ---
+                            chosen_rows = roll_rows[roll_rows["_date_label"].isin(chosen_dates)].sort_values(date_col, kind="stable")
+                            if len(chosen_rows) >= 2:
+                                st.markdown("### 🔍 Compare Profiles")
+                                dist_values = tuple(d for d, _ in found_distance_cols)
+                                dist_cols = [c for _, c in found_distance_cols]
+
+                                # One profile per row: a roll can have several rows on one date
+                                # (e.g. TOP and BOTTOM), so label rows by date, stand and position
+                                row_labels = chosen_rows["_date_label"].astype(str)
+                                for key_col in (find_col_by_candidates(norm_cols, ["stand"]), find_col_by_candidates(norm_cols, ["position"])):
+                                    if key_col is not None:
+                                        row_labels = row_labels + " " + chosen_rows[key_col].astype(str).str.strip()
+                                repeated = row_labels.duplicated(keep=False)
+                                row_labels = row_labels.where(~repeated, row_labels + " (Row " + (chosen_rows.index.to_series() + 1).astype(str) + ")")
+                                row_labels = tuple(row_labels)
+
+                                col1, col2 = st.columns(2)
+                                with col1:
+                                    baseline = st.selectbox("Baseline (before)", row_labels, index=0)
+                                with col2:
+                                    method = st.radio("Interpolation", RESAMPLE_METHODS, horizontal=True)
+
+                                # All selected rows are resampled together; each comparison is a row minus the baseline
+                                grid, curves = resample_roll_rows(
+                                    str(selected_roll), row_labels, dist_values,
+                                    tuple(map(tuple, profile_matrix(chosen_rows, dist_cols))), method,
+                                )
+                                results = profile_deltas(str(selected_roll), row_labels, grid, curves, row_labels.index(baseline))
+
+                                if not results:
+                                    st.warning("No overlapping distances to compare for the selected dates.")
+                                else:
+                                    summary_df = pd.DataFrame([
+                                        {
+                                            "Comparison": f"{r['after']} vs {r['before']}",
+                                            "Removed Stock Mean (mm)": round(r["removed_stock_mean"], 3),
+                                            "Removed Stock Max (mm)": round(r["removed_stock_max"], 3),
+                                            "Max Deviation (mm)": round(r["max_deviation"], 3),
+                                        }
+                                        for r in results
+                                    ])
+                                    st.dataframe(summary_df, use_container_width=True, hide_index=True)
+
+                                    delta_df = delta_frame(results)
+                                    delta_chart = (
+                                        alt.Chart(delta_df, title="Profile Difference")
+                                        .mark_line()
+                                        .encode(
+                                            x=alt.X(
+                                                "Distance:Q",
+                                                title="Distance (mm)",
+                                                scale=alt.Scale(domain=[min_dist, max_dist]),
+                                                axis=alt.Axis(values=x_axis_values),
+                                            ),
+                                            y=alt.Y("Delta:Q", title="Δ Diameter (mm)"),
+                                            color=alt.Color("Comparison:N", title="Comparison"),
+                                            tooltip=[
+                                                alt.Tooltip("Comparison"),
+                                                alt.Tooltip("Distance", title="Distance (mm)"),
+                                                alt.Tooltip("Delta", title="Δ Diameter (mm)", format=".3f"),
+                                            ],
+                                        )
+                                        .properties(height=300)
+                                    )
+                                    st.altair_chart(delta_chart, use_container_width=True)
+
+                                    def to_delta_excel_bytes(summary, deltas):
+                                        output = BytesIO()
+                                        with pd.ExcelWriter(output) as writer:
+                                            summary.to_excel(writer, sheet_name="Summary", index=False)
+                                            deltas.to_excel(writer, sheet_name="Delta Curves", index=False)
+                                        output.seek(0)
+                                        return output.getvalue()
+
+                                    st.download_button(
+                                        "⬇️ Download Delta Curves",
+                                        data=to_delta_excel_bytes(summary_df, delta_df),
+                                        file_name=f"roll_delta_{selected_roll}.xlsx",
+                                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                        use_container_width=True
+                                    )
             else:
                 st.info("Please choose a Roll No from the dropdown to plot.")
 
 st.markdown('</div>', unsafe_allow_html=True)
 
+# ---------- Remaining Life Forecast Section ----------
+st.markdown('<div class="data-section">', unsafe_allow_html=True)
+st.markdown("## ⏳ Remaining Life Forecast")
 
+if df.empty:
+    st.info("No data to forecast.")
+elif date_col is None or roll_col is None or not found_distance_cols:
+    st.info("Forecast needs Date, Roll No and distance columns in the sheet.")
+else:
+    forecast_df = forecast_cache().forecast(df_plot, date_col, roll_col, [c for _, c in found_distance_cols])
 
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        horizon = st.slider("Show rolls reaching scrap within (days)", min_value=7, max_value=365, value=90, step=7)
+    with col2:
+        show_all_rolls = st.checkbox("Show all rolls", value=False)
 
+    nearing_df = forecast_df.sort_values(["Days Left", "Campaigns Left"], na_position="last")
+    if not show_all_rolls:
+        nearing_df = nearing_df[nearing_df["Days Left"] <= horizon]
 
+    if nearing_df.empty:
+        st.success(f"✅ No roll is forecast to reach {MIN_DIA:.0f} mm within {horizon} days.")
+    else:
+        st.dataframe(
+            nearing_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Last Date": st.column_config.DateColumn("Last Date"),
+                "Scrap Date": st.column_config.DateColumn("Scrap Date"),
+                "Latest Min Dia (mm)": st.column_config.NumberColumn(format="%.2f"),
+                "Wear Rate (mm/day)": st.column_config.NumberColumn(format="%.4f"),
+                "Campaigns Left": st.column_config.NumberColumn(format="%.1f"),
+            },
+        )
 
+st.markdown('</div>', unsafe_allow_html=True)
 
+# ---------- Roll Report Packs Section ----------
+st.markdown('<div class="data-section">', unsafe_allow_html=True)
+st.markdown("## 📑 Roll Report Packs")
 
+if df.empty:
+    st.info("No data for reports.")
+elif date_col is None or roll_col is None or not found_distance_cols:
+    st.info("Reports need Date, Roll No and distance columns in the sheet.")
+else:
+    with st.form("report_pack_form"):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            report_rolls = st.multiselect("Rolls (all if empty)", roll_options)
+        with col2:
+            report_format = st.radio("Format", list(REPORT_FORMATS))
+        build_pack = st.form_submit_button("📦 Build Report Pack", use_container_width=True)
+
+    if build_pack:
+        selected_rolls = report_rolls or roll_options
+        report_rows = df_plot[df_plot[roll_col].astype(str).isin(selected_rolls)]
+        payloads = [
+            roll_payload(rows, roll_col, date_col, found_distance_cols)
+            for _, rows in report_rows.groupby(report_rows[roll_col].astype(str), sort=True)
+        ]
+        progress_bar = st.progress(0.0, text="Rendering reports...")
+        fmt = REPORT_FORMATS[report_format]
+        try:
+            with build_report_pack(
+                payloads, fmt,
+                progress=lambda done, total: progress_bar.progress(done / total, text=f"Rendered {done} of {total} reports"),
+            ) as pack:
+                pack_bytes = pack.read()
+        except TimeoutError:
+            pack_bytes = None
+        progress_bar.empty()
+        if pack_bytes is None:
+            st.error("❌ Report rendering stopped responding. Finished reports are cached; try again.")
+        else:
+            st.download_button(
+                f"⬇️ Download {len(payloads)} Reports (.zip)",
+                data=pack_bytes,
+                file_name=f"roll_reports_{fmt}.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
 
+st.markdown('</div>', unsafe_allow_html=True)
 
+# ---------- Shop Dashboard Section ----------
+st.markdown('<div class="data-section">', unsafe_allow_html=True)
+st.markdown("## 🏭 Shop Dashboard")
 
+rollups = shop_rollups()
+dashboard_dim = st.radio("Group by", list(ROLLUP_DIMENSIONS), horizontal=True)
+summary_df = rollups.summary(dashboard_dim)
 
+if summary_df.empty:
+    st.info("No data to summarise.")
+else:
+    st.dataframe(
+        summary_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={c: st.column_config.NumberColumn(format="%.2f") for c in summary_df.columns if c.endswith("mean") or c.startswith("Spread")},
+    )
+
+    dist_df = rollups.latest_distribution(dashboard_dim)
+    if not dist_df.empty:
+        dist_chart = (
+            alt.Chart(dist_df, title="Latest Diameter Distribution (per roll)")
+            .mark_bar()
+            .encode(
+                x=alt.X("Latest Diameter (mm):N", title="Latest Diameter (mm)", sort=None),
+                y=alt.Y("Rolls:Q", title="Rolls"),
+                color=alt.Color(f"{dashboard_dim}:N", title=dashboard_dim),
+                xOffset=alt.XOffset(f"{dashboard_dim}:N"),
+                tooltip=[dashboard_dim, "Latest Diameter (mm)", "Rolls"],
+            )
+            .properties(height=300)
+        )
+        st.altair_chart(dist_chart, use_container_width=True)
 
-
-
-
+st.markdown('</div>', unsafe_allow_html=True)